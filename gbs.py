@@ -1,181 +1,506 @@
 import googlemaps
-import pandas as pd
+import csv
 import json
+import orjson
 import logging
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import dbm
+import functools
+import shelve
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import os
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 
 # Load environment variables
 load_dotenv()
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Keep per-request chatter from third-party clients out of non-debug runs
+if LOG_LEVEL > logging.DEBUG:
+    for name in ('googlemaps', 'urllib3'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
 # Rate limiting parameters
 RATE_LIMIT = 10  # requests per second
 RATE_LIMIT_PERIOD = 1  # second
 
-class RateLimiter:
-    def __init__(self, max_calls, period):
-        self.max_calls = max_calls
-        self.period = period
-        self.calls = []
+# Concurrent Place Details fetches (paced by the token bucket)
+MAX_WORKERS = 20
+# Concurrent website scrapes; matches the HTTP session pool size
+EMAIL_MAX_WORKERS = 32
+
+# Place Details fields used by get_place_details (limits payload and billing SKUs).
+# Note the field mask uses 'type' while the response key is 'types'.
+PLACE_DETAIL_FIELDS = [
+    'name', 'formatted_address', 'formatted_phone_number', 'website',
+    'rating', 'user_ratings_total', 'type'
+]
+
+# Maximum rows per Supabase insert request
+SUPABASE_BATCH_SIZE = 500
+SUPABASE_MAX_WORKERS = 8  # concurrent inserts when falling back to per-row mode
+
+class TokenBucket:
+    def __init__(self, capacity=10, refill_rate=10.0):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.refill_rate)
+            self.last = now
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.refill_rate)
+                self.last = time.monotonic()
+                self.tokens = 0
+            else:
+                self.tokens -= 1
+
+bucket = TokenBucket(RATE_LIMIT, RATE_LIMIT / RATE_LIMIT_PERIOD)
 
-    def __call__(self, f):
-        def wrapped(*args, **kwargs):
-            now = time.time()
-            self.calls = [t for t in self.calls if now - t < self.period]
-            if len(self.calls) >= self.max_calls:
-                sleep_time = self.period - (now - self.calls[0])
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-            self.calls.append(time.time())
-            return f(*args, **kwargs)
-        return wrapped
-
-@RateLimiter(RATE_LIMIT, RATE_LIMIT_PERIOD)
 def rate_limited_api_call(func, *args, **kwargs):
+    bucket.acquire()
     return func(*args, **kwargs)
 
+# "lat,lng" strings (e.g. SEARCH_LOCATION="37.77,-122.42") skip geocoding
+COORDINATES_RE = re.compile(r'\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*')
+
+# Persistent caches
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gbs")
+GEOCODE_CACHE_FILE = os.path.join(CACHE_DIR, "geocode.json")  # keyed by normalized address
+PROCESSED_PLACES_FILE = os.path.join(CACHE_DIR, "processed_places")  # shelve of place_id -> timestamp
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+# Shared HTTP session for website scraping (keep-alive + connection pooling).
+# Read timeouts are not retried, so a stalled site costs a single timeout, and
+# connect failures get one retry, so with WEBSITE_*_TIMEOUT below an
+# unreachable host costs at most two 3s connect attempts.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=2, connect=1, read=False, backoff_factor=0.3))
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+SESSION.headers.update({"User-Agent": "gbs/1.0", "Accept-Encoding": "gzip, deflate"})
+
+# Process-wide DNS cache, installed by main(): many places share hosts (site
+# builders, chains), and a run is short-lived, so entries never need to expire
+_getaddrinfo = socket.getaddrinfo
+
+@functools.lru_cache(maxsize=4096)
+def _cached_getaddrinfo(*args, **kwargs):
+    return _getaddrinfo(*args, **kwargs)
+
+def _install_dns_cache():
+    socket.getaddrinfo = _cached_getaddrinfo
+
+# (connect, read) timeouts for website requests. Worst cases per website:
+# unreachable ~6s (two HEAD connect attempts), stalled 3s + 5s on the HEAD,
+# and a slow page after a good HEAD 3s + 7s on the GET.
+WEBSITE_HEAD_TIMEOUT = (3, 5)
+WEBSITE_GET_TIMEOUT = (3, 7)
+
+# Website email scanning: regex over raw response bytes, read in chunks
+EMAIL_RE = re.compile(rb'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+EMAIL_IGNORED_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp')  # e.g. logo@2x.png
+EMAIL_SCAN_CHUNK_SIZE = 65536
+EMAIL_MAX_LENGTH = 254  # RFC 5321 path limit
+EMAIL_SCAN_OVERLAP = EMAIL_MAX_LENGTH  # tail kept between chunks, so no address is split
+EMAIL_CHAR_RE = re.compile(rb'[A-Za-z0-9._%+@-]')
+EMAIL_SCAN_MAX_BYTES = 512 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+WEBSITE_MAX_CONTENT_LENGTH = 2_000_000  # skip pages that advertise a larger body
+
+def _first_email(buf, limit, cut_mid_token=False):
+    """Return (email, start of the first match past ``limit``) for ``buf``."""
+    # Most chunks contain no '@' at all; a bytes search is far cheaper than the regex
+    if b'@' not in buf:
+        return None, None
+    for match in EMAIL_RE.finditer(buf):
+        if match.start() == 0 and cut_mid_token:
+            # \b matched at a cut inside a longer token; this is a fragment
+            continue
+        if match.end() > limit:
+            return None, match.start()
+        email = match.group().decode()
+        if not email.lower().endswith(EMAIL_IGNORED_SUFFIXES):
+            return email, None
+    return None, None
+
+def _media_type(headers):
+    return headers.get('Content-Type', '').split(';')[0].strip().lower()
+
 def extract_email_from_website(url):
     try:
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        email_regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_regex, soup.get_text())
-        return emails[0] if emails else None
+        # Cheap probe so PDFs, media and huge pages are never downloaded.
+        # Servers that reject HEAD with an error status fall through to the GET;
+        # a host that can't be reached or times out is not retried with a GET.
+        try:
+            head = SESSION.head(url, timeout=WEBSITE_HEAD_TIMEOUT, allow_redirects=True)
+        except requests.HTTPError as e:
+            logger.debug("HEAD request to %s failed, trying GET: %s", url, e)
+            head = None
+        if head is not None and head.ok:
+            content_type = _media_type(head.headers)
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                logger.info("Skipping non-HTML website %s (%s)", url, content_type)
+                return None
+            content_length = head.headers.get('Content-Length', '0')
+            if content_length.isdigit() and int(content_length) > WEBSITE_MAX_CONTENT_LENGTH:
+                logger.info("Skipping large website %s (%s bytes)", url, content_length)
+                return None
+            url = head.url
+
+        with SESSION.get(url, timeout=WEBSITE_GET_TIMEOUT, allow_redirects=True, stream=True) as response:
+            response.raise_for_status()
+            content_type = _media_type(response.headers)
+            # Like the HEAD probe, a missing Content-Type is scanned rather than skipped
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                logger.info("Skipping non-HTML website %s (%s)", url, content_type)
+                return None
+            buf = b''
+            total = 0
+            cut_mid_token = False
+            for chunk in response.iter_content(chunk_size=EMAIL_SCAN_CHUNK_SIZE):
+                total += len(chunk)
+                buf += chunk
+                done = total >= EMAIL_SCAN_MAX_BYTES
+                # A match touching the tail of the buffer may continue in the next chunk
+                limit = len(buf) if done else len(buf) - EMAIL_SCAN_OVERLAP
+                email, deferred_start = _first_email(buf, limit, cut_mid_token)
+                if email or done:
+                    return email
+                keep_from = max(0, len(buf) - EMAIL_SCAN_OVERLAP)
+                if deferred_start is not None:
+                    keep_from = min(keep_from, deferred_start)
+                if keep_from > 0:
+                    cut_mid_token = EMAIL_CHAR_RE.match(buf, keep_from - 1) is not None
+                buf = buf[keep_from:]
+            return _first_email(buf, len(buf), cut_mid_token)[0]
     except Exception as e:
-        logger.error(f"Error extracting email from {url}: {e}")
+        logger.error("Error extracting email from %s: %s", url, e)
         return None
 
-def get_place_details(gmaps, place_id):
-    details = rate_limited_api_call(gmaps.place, place_id=place_id)
+class OrjsonClient(googlemaps.Client):
+    """googlemaps.Client that decodes API responses with orjson."""
+
+    def _get_body(self, response):
+        response.json = lambda **kwargs: orjson.loads(response.content)
+        return super()._get_body(response)
+
+def get_place_basic(gmaps, place_id):
+    details = rate_limited_api_call(gmaps.place, place_id=place_id, fields=PLACE_DETAIL_FIELDS)
     info = details['result']
-    email = None
-    website = info.get('website')
-    if website:
-        logger.info(f"Attempting to extract email from website: {website}")
-        email = extract_email_from_website(website)
-        if email:
-            logger.info(f"Email extracted: {email}")
-        else:
-            logger.info("No email found on the website")
-    
     return {
         'Name': info.get('name'),
         'Address': info.get('formatted_address'),
         'Phone': info.get('formatted_phone_number'),
-        'Website': website,
-        'Email': email,
+        'Website': info.get('website'),
+        'Email': None,
         'Rating': info.get('rating'),
         'Reviews': info.get('user_ratings_total'),
         'Types': ', '.join(info.get('types', []))
     }
 
-def get_location_coordinates(gmaps, location):
-    logger.debug(f"Attempting to get coordinates for location: {location}")
-    if isinstance(location, tuple) and len(location) == 2:
-        logger.debug(f"Location is already in coordinate form: {location}")
-        return location
+def enrich_with_email(record):
+    website = record['Website']
+    logger.info("Attempting to extract email from website: %s", website)
+    record['Email'] = extract_email_from_website(website)
+    if record['Email']:
+        logger.info("Email extracted: %s", record['Email'])
     else:
+        logger.info("No email found on the website")
+    return record
+
+def _fetch_place(gmaps, place_id, email_executor):
+    # Places with a website go straight to the scraping pool; the caller
+    # receives that pool's future instead of a finished record.
+    record = get_place_basic(gmaps, place_id)
+    if record['Website']:
+        return email_executor.submit(enrich_with_email, record)
+    return record
+
+def _load_geocode_cache():
+    global _geocode_cache
+    if _geocode_cache is None:
         try:
-            geocode_result = rate_limited_api_call(gmaps.geocode, location)
-            if geocode_result:
-                lat = geocode_result[0]['geometry']['location']['lat']
-                lng = geocode_result[0]['geometry']['location']['lng']
-                logger.debug(f"Geocoded {location} to coordinates: ({lat}, {lng})")
-                return (lat, lng)
-            else:
-                raise ValueError(f"Unable to geocode location: {location}")
-        except Exception as e:
-            logger.error(f"Error geocoding location {location}: {e}")
-            raise
+            with open(GEOCODE_CACHE_FILE) as f:
+                _geocode_cache = json.load(f)
+        except (OSError, ValueError):
+            _geocode_cache = {}
+    return _geocode_cache
+
+def _save_geocode_cache(cache):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = f"{GEOCODE_CACHE_FILE}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, GEOCODE_CACHE_FILE)
+    except OSError as e:
+        logger.warning("Unable to write geocode cache %s: %s", GEOCODE_CACHE_FILE, e)
+
+def _geocode(gmaps, addr_str):
+    # _geocode_cache is the in-memory layer: the file is read once per process
+    with _geocode_cache_lock:
+        entry = _load_geocode_cache().get(addr_str)
+    if entry:
+        logger.debug("Geocode cache hit for %s", addr_str)
+        return (entry['lat'], entry['lng'])
+
+    geocode_result = rate_limited_api_call(gmaps.geocode, addr_str)
+    if not geocode_result:
+        raise ValueError(f"Unable to geocode location: {addr_str}")
+    lat = geocode_result[0]['geometry']['location']['lat']
+    lng = geocode_result[0]['geometry']['location']['lng']
+
+    with _geocode_cache_lock:
+        cache = _load_geocode_cache()
+        cache[addr_str] = {'lat': lat, 'lng': lng, 'ts': time.time()}
+        _save_geocode_cache(cache)
+    return (lat, lng)
+
+def _load_processed_place_ids():
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with shelve.open(PROCESSED_PLACES_FILE) as db:
+            return set(db.keys())
+    except (OSError, *dbm.error) as e:
+        logger.warning("Unable to read processed places %s, fetching all places: %s", PROCESSED_PLACES_FILE, e)
+        return set()
+
+def _mark_places_processed(place_ids):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with shelve.open(PROCESSED_PLACES_FILE) as db:
+            now = time.time()
+            for place_id in place_ids:
+                db[place_id] = now
+    except (OSError, *dbm.error) as e:
+        logger.warning("Unable to record processed places in %s: %s", PROCESSED_PLACES_FILE, e)
+
+def get_location_coordinates(gmaps, location):
+    logger.debug("Attempting to get coordinates for location: %s", location)
+    if isinstance(location, (tuple, list)) and len(location) == 2:
+        logger.debug("Location is already in coordinate form: %s", location)
+        return (float(location[0]), float(location[1]))
+    elif isinstance(location, dict) and 'lat' in location and 'lng' in location:
+        logger.debug("Location is already in coordinate form: %s", location)
+        return (float(location['lat']), float(location['lng']))
+
+    match = COORDINATES_RE.fullmatch(location)
+    if match:
+        lat, lng = float(match[1]), float(match[2])
+        # Out-of-range pairs such as "90210, 10001" are addresses, not coordinates
+        if -90 <= lat <= 90 and -180 <= lng <= 180:
+            logger.debug("Location is a coordinate string: %s", location)
+            return (lat, lng)
+
+    try:
+        lat, lng = _geocode(gmaps, location.strip().lower())
+        logger.debug("Geocoded %s to coordinates: (%s, %s)", location, lat, lng)
+        return (lat, lng)
+    except Exception as e:
+        logger.error("Error geocoding location %s: %s", location, e)
+        raise
 
-def get_google_maps_data(api_key, location, query, num_results=100, radius=50000):
-    gmaps = googlemaps.Client(key=api_key)
+def _fetch_places(api_key, location, query, num_results, radius, skip_processed):
+    """Yield (place_id, record) pairs as each place finishes fetching."""
+    gmaps = OrjsonClient(key=api_key)
     
-    logger.info(f"Fetching data for query: {query} in location: {location}")
+    logger.info("Fetching data for query: %s in location: %s", query, location)
     try:
         location_coords = get_location_coordinates(gmaps, location)
     except Exception as e:
-        logger.error(f"Failed to get coordinates for location {location}: {e}")
-        return []
+        logger.error("Failed to get coordinates for location %s: %s", location, e)
+        return
     
-    results = []
+    submitted = 0
+    fetched = 0
     next_page_token = None
+    future_to_place = {}
+    # Pages can overlap, and with skip_processed places ingested by earlier runs are skipped too
+    seen = _load_processed_place_ids() if skip_processed else set()
 
-    while len(results) < num_results:
-        try:
-            logger.debug(f"Searching for places. Current results: {len(results)}, Target: {num_results}")
-            if next_page_token:
-                time.sleep(2)  # Delay to respect API rate limits
-                places = rate_limited_api_call(gmaps.places, query=query, location=location_coords, radius=radius, page_token=next_page_token)
-            else:
-                places = rate_limited_api_call(gmaps.places, query=query, location=location_coords, radius=radius)
-            
-            results.extend(places['results'])
-            next_page_token = places.get('next_page_token')
-            
-            logger.info(f"Fetched {len(results)} results so far")
-            
-            if not next_page_token:
-                logger.debug("No more pages available")
-                break
-        except Exception as e:
-            logger.error(f"Error fetching places: {e}")
-            break
-
-    results = results[:num_results]
-    
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_place = {executor.submit(get_place_details, gmaps, place['place_id']): place for place in results}
-        data = []
-        for future in as_completed(future_to_place):
+    # Details for each page are submitted as soon as the page arrives, so the
+    # workers fetch them while we wait for the next page token to activate.
+    # The email pool is entered first so it shuts down after the details pool
+    with ThreadPoolExecutor(max_workers=EMAIL_MAX_WORKERS) as email_executor, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        while submitted < num_results:
             try:
-                data.append(future.result())
+                logger.debug("Searching for places. Current results: %s, Target: %s", submitted, num_results)
+                if next_page_token:
+                    time.sleep(2)  # Delay to respect API rate limits
+                    places = rate_limited_api_call(gmaps.places, query=query, location=location_coords, radius=radius, page_token=next_page_token)
+                else:
+                    places = rate_limited_api_call(gmaps.places, query=query, location=location_coords, radius=radius)
+                
+                for place in places['results']:
+                    if submitted >= num_results:
+                        break
+                    if place['place_id'] not in seen:
+                        seen.add(place['place_id'])
+                        future_to_place[executor.submit(_fetch_place, gmaps, place['place_id'], email_executor)] = place
+                        submitted += 1
+                next_page_token = places.get('next_page_token')
+                
+                logger.info("Fetched %s results so far", submitted)
+                
+                if not next_page_token:
+                    logger.debug("No more pages available")
+                    break
             except Exception as e:
-                logger.error(f"Error fetching place details: {e}")
-    
-    logger.info(f"Successfully fetched details for {len(data)} places")
-    return data
-
-def save_to_file(data, output_file, output_csv=True, output_json=True):
-    if output_csv:
-        csv_file = f"{output_file}.csv"
-        pd.DataFrame(data).to_csv(csv_file, index=False)
-        logger.info(f"Data saved to CSV: {csv_file}")
+                logger.error("Error fetching places: %s", e)
+                break
+
+        while future_to_place:
+            done, _ = wait(future_to_place, return_when=FIRST_COMPLETED)
+            for future in done:
+                # Drop the future so finished records aren't kept alive until the end
+                place = future_to_place.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error("Error fetching place details: %s", e)
+                    continue
+                if isinstance(result, Future):
+                    # Email scrape still running for this place
+                    future_to_place[result] = place
+                    continue
+                fetched += 1
+                yield place['place_id'], result
     
-    if output_json:
-        json_file = f"{output_file}.json"
-        with open(json_file, 'w') as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"Data saved to JSON: {json_file}")
+    logger.info("Successfully fetched details for %s places", fetched)
+
+class OutputWriter:
+    """Streams records to CSV and/or JSON; files are created on the first record."""
 
-def add_to_supabase(data):
+    def __init__(self, output_file, output_csv=True, output_json=True):
+        self.output_file = output_file
+        self.output_csv = output_csv
+        self.output_json = output_json
+        self.count = 0
+        self._csv_file = None
+        self._csv_writer = None
+        self._json_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self, record):
+        if self.output_csv:
+            self._csv_file = open(f"{self.output_file}.csv", 'w', newline='', encoding='utf-8')
+            self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=list(record.keys()))
+            self._csv_writer.writeheader()
+        if self.output_json:
+            self._json_file = open(f"{self.output_file}.json", 'wb')
+            self._json_file.write(b'[')
+
+    def write(self, record):
+        if self.count == 0:
+            self._open(record)
+        if self._csv_writer:
+            self._csv_writer.writerow(record)
+        if self._json_file:
+            # Re-indent each element so the file matches a single indented array dump
+            self._json_file.write(b'\n  ' if self.count == 0 else b',\n  ')
+            self._json_file.write(orjson.dumps(record, option=orjson.OPT_INDENT_2).replace(b'\n', b'\n  '))
+        self.count += 1
+
+    def close(self):
+        if self._csv_file:
+            self._csv_file.close()
+            logger.info("Data saved to CSV: %s", self._csv_file.name)
+        if self._json_file:
+            self._json_file.write(b'\n]')
+            self._json_file.close()
+            logger.info("Data saved to JSON: %s", self._json_file.name)
+        self._csv_file = self._csv_writer = self._json_file = None
+
+def _create_supabase_client():
     url: str = os.getenv("SUPABASE_URL")
     key: str = os.getenv("SUPABASE_KEY")
     supabase: Client = create_client(url, key)
-    
-    table_name = os.getenv("SUPABASE_TABLE_NAME", "google_maps_data")
-    
-    for item in data:
-        try:
-            response = supabase.table(table_name).insert(item).execute()
-            if response.data:
-                logger.info(f"Successfully added item: {item['Name']} to Supabase")
-            else:
-                logger.error(f"Failed to add item: {item['Name']} to Supabase")
-        except Exception as e:
-            logger.error(f"Error adding item to Supabase: {e}")
+    return supabase
+
+def _insert_row(supabase, table_name, item):
+    response = supabase.table(table_name).insert(item).execute()
+    if response.data:
+        logger.info("Successfully added item: %s to Supabase", item['Name'])
+        return True
+    logger.error("Failed to add item: %s to Supabase", item['Name'])
+    return False
+
+def _insert_rows_individually(supabase, table_name, rows):
+    inserted = [False] * len(rows)
+    # The shared client keeps one pooled HTTP connection set across workers
+    with ThreadPoolExecutor(max_workers=SUPABASE_MAX_WORKERS) as executor:
+        future_to_index = {executor.submit(_insert_row, supabase, table_name, item): i for i, item in enumerate(rows)}
+        for future in as_completed(future_to_index):
+            try:
+                inserted[future_to_index[future]] = future.result()
+            except Exception as e:
+                logger.error("Error adding item to Supabase: %s", e)
+    return inserted
+
+def _insert_rows(supabase, table_name, rows):
+    """Insert ``rows`` as one batch; returns a success flag per row."""
+    try:
+        response = supabase.table(table_name).insert(rows).execute()
+        if response.data:
+            logger.info("Successfully added %s items to Supabase", len(rows))
+            return [True] * len(rows)
+        logger.error("Failed to add batch of %s items to Supabase", len(rows))
+        return [False] * len(rows)
+    except Exception as e:
+        # Fall back to per-row inserts so one bad row doesn't drop the whole chunk
+        logger.error("Error adding batch of %s items to Supabase, retrying row by row: %s", len(rows), e)
+        return _insert_rows_individually(supabase, table_name, rows)
+
+def _write_records(places, writer, supabase=None, table_name=None):
+    """Write (place_id, record) pairs to the output files and, in batches, to
+    Supabase. Returns the ids of places that were stored successfully."""
+    stored = []
+    pending = []
+
+    def flush():
+        inserted = _insert_rows(supabase, table_name, [record for _, record in pending])
+        stored.extend(place_id for (place_id, _), ok in zip(pending, inserted) if ok)
+        pending.clear()
+
+    for place_id, record in places:
+        writer.write(record)
+        if supabase is None:
+            stored.append(place_id)
+            continue
+        pending.append((place_id, record))
+        if len(pending) >= SUPABASE_BATCH_SIZE:
+            flush()
+    if pending:
+        flush()
+    return stored
 
 def main():
+    _install_dns_cache()
+
     # Read configuration from .env file
     config = {
         "GOOGLE_MAPS_API_KEY": os.getenv("GOOGLE_MAPS_API_KEY"),
@@ -186,7 +511,8 @@ def main():
         "OUTPUT_FILE": os.getenv("OUTPUT_FILE", "output"),
         "OUTPUT_CSV": os.getenv("OUTPUT_CSV", "true").lower() == "true",
         "OUTPUT_JSON": os.getenv("OUTPUT_JSON", "true").lower() == "true",
-        "USE_SUPABASE": os.getenv("USE_SUPABASE", "false").lower() == "true"
+        "USE_SUPABASE": os.getenv("USE_SUPABASE", "false").lower() == "true",
+        "SKIP_PROCESSED_PLACES": os.getenv("SKIP_PROCESSED_PLACES", "false").lower() == "true"
     }
 
     # Check for missing required configuration
@@ -195,7 +521,7 @@ def main():
     if missing_config:
         logger.error("Missing required configuration. Please check your .env file.")
         for item in missing_config:
-            logger.error(f"Missing configuration: {item}")
+            logger.error("Missing configuration: %s", item)
         return
 
     # Convert types and set defaults
@@ -203,37 +529,56 @@ def main():
         config["NUM_RESULTS"] = int(config["NUM_RESULTS"])
         config["SEARCH_RADIUS"] = int(config["SEARCH_RADIUS"])
     except ValueError as e:
-        logger.error(f"Error in configuration values: {e}")
+        logger.error("Error in configuration values: %s", e)
         return
 
     # Log the configuration (excluding the API key for security)
     logger.info("Current configuration:")
     for key, value in config.items():
         if key != "GOOGLE_MAPS_API_KEY":
-            logger.info(f"{key}: {value}")
+            logger.info("%s: %s", key, value)
 
     # Debug log for location
-    logger.debug(f"Search location from config: {config['SEARCH_LOCATION']}")
+    logger.debug("Search location from config: %s", config['SEARCH_LOCATION'])
 
-    data = get_google_maps_data(
+    use_supabase = config["USE_SUPABASE"]
+    if use_supabase and not all([os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"), os.getenv("SUPABASE_TABLE_NAME")]):
+        logger.error("Supabase is enabled but missing required configuration. Please check your .env file for SUPABASE_URL, SUPABASE_KEY, and SUPABASE_TABLE_NAME.")
+        use_supabase = False
+
+    # Client setup happens before fetching, and a failure only disables the
+    # Supabase sink so the local output files are still written
+    supabase = None
+    if use_supabase:
+        try:
+            supabase = _create_supabase_client()
+        except Exception as e:
+            logger.error("Failed to set up Supabase client, writing output files only: %s", e)
+    table_name = os.getenv("SUPABASE_TABLE_NAME")
+
+    places = _fetch_places(
         config["GOOGLE_MAPS_API_KEY"],
         config["SEARCH_LOCATION"],
         config["SEARCH_QUERY"],
         config["NUM_RESULTS"],
-        config["SEARCH_RADIUS"]
+        config["SEARCH_RADIUS"],
+        config["SKIP_PROCESSED_PLACES"]
     )
-    
-    if not data:
-        logger.error("No data retrieved. Check the logs for errors.")
-        return
 
-    save_to_file(data, config["OUTPUT_FILE"], config["OUTPUT_CSV"], config["OUTPUT_JSON"])
-    
-    if config["USE_SUPABASE"]:
-        if not all([os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"), os.getenv("SUPABASE_TABLE_NAME")]):
-            logger.error("Supabase is enabled but missing required configuration. Please check your .env file for SUPABASE_URL, SUPABASE_KEY, and SUPABASE_TABLE_NAME.")
+    # Records are written to the output files as they arrive and then handed to Supabase in batches
+    with OutputWriter(config["OUTPUT_FILE"], config["OUTPUT_CSV"], config["OUTPUT_JSON"]) as writer:
+        stored = _write_records(places, writer, supabase, table_name)
+
+    # Only places that actually reached Supabase (or the output files) are skipped
+    # next time. If Supabase was requested but unavailable, nothing was ingested.
+    if config["SKIP_PROCESSED_PLACES"]:
+        if config["USE_SUPABASE"] and supabase is None:
+            logger.warning("Supabase was unavailable, so no places are recorded as processed")
         else:
-            add_to_supabase(data)
+            _mark_places_processed(stored)
+    
+    if not writer.count:
+        logger.error("No data retrieved. Check the logs for errors.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
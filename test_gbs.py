@@ -0,0 +1,168 @@
+from unittest import mock
+
+import gbs
+
+
+class FakeResponse:
+    def __init__(self, body, headers=None, chunk_size=gbs.EMAIL_SCAN_CHUNK_SIZE):
+        self.body = body
+        self.headers = {'Content-Type': 'text/html'} if headers is None else headers
+        self.chunk_size = chunk_size
+        self.ok = True
+        self.url = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), self.chunk_size):
+            yield self.body[i:i + self.chunk_size]
+
+
+def extract(body, **kwargs):
+    response = FakeResponse(body, **kwargs)
+    with mock.patch.object(gbs, 'SESSION') as session:
+        session.head.return_value = FakeResponse(b'', headers=response.headers)
+        session.head.return_value.url = 'http://example.com/'
+        session.get.return_value = response
+        return gbs.extract_email_from_website('http://example.com/')
+
+
+def test_email_across_chunk_boundary():
+    email = b'averyveryverylongname@example.com'
+    # Decompressed chunks are often much smaller than the requested chunk size
+    for chunk_size in (16, 100, gbs.EMAIL_SCAN_CHUNK_SIZE):
+        # Straddle both a chunk end and the overlap cut before it
+        for boundary in (chunk_size * 3, chunk_size * 3 - gbs.EMAIL_SCAN_OVERLAP):
+            for offset in range(1, len(email)):
+                body = b' ' * (boundary - offset) + email + b' ' * (chunk_size * 2)
+                assert extract(body, chunk_size=chunk_size) == email.decode()
+
+
+def test_email_inside_overlap_window():
+    email = b'info@example.com'
+    body = b' ' * (gbs.EMAIL_SCAN_CHUNK_SIZE - 100) + email + b' ' * 1000
+    assert extract(body) == email.decode()
+
+
+def test_fragment_of_long_token_is_not_returned():
+    # The overlap cut lands inside a token longer than any valid address
+    token = b'x' * (gbs.EMAIL_SCAN_OVERLAP * 2) + b'@example.com'
+    body = b' ' * (gbs.EMAIL_SCAN_CHUNK_SIZE - gbs.EMAIL_SCAN_OVERLAP - 10) + token
+    assert extract(body) is None
+
+
+def test_image_filenames_are_skipped():
+    assert extract(b'<img src="logo@2x.png"> contact: hi@shop.com') == 'hi@shop.com'
+
+
+def test_missing_content_type_is_scanned():
+    assert extract(b'contact: hi@shop.com', headers={}) == 'hi@shop.com'
+
+
+def test_non_html_content_type_is_skipped():
+    assert extract(b'contact: hi@shop.com', headers={'Content-Type': 'application/pdf'}) is None
+
+
+class FakeSupabase:
+    """Rejects any batch containing a row named 'bad', then that row alone."""
+
+    def __init__(self):
+        self.rows = []
+
+    def table(self, name):
+        return self
+
+    def insert(self, rows):
+        self.pending = rows
+        return self
+
+    def execute(self):
+        rows = self.pending if isinstance(self.pending, list) else [self.pending]
+        if any(row['Name'] == 'bad' for row in rows):
+            raise RuntimeError('insert failed')
+        self.rows.extend(rows)
+        return mock.Mock(data=rows)
+
+
+def test_only_stored_places_are_reported(tmp_path):
+    places = [('p1', {'Name': 'a'}), ('p2', {'Name': 'bad'}), ('p3', {'Name': 'c'})]
+    supabase = FakeSupabase()
+    with gbs.OutputWriter(str(tmp_path / 'out')) as writer:
+        stored = gbs._write_records(iter(places), writer, supabase, 'places')
+    assert stored == ['p1', 'p3']
+    assert writer.count == 3
+    assert [row['Name'] for row in supabase.rows] == ['a', 'c']
+
+
+def test_failed_head_falls_through_to_get():
+    with mock.patch.object(gbs, 'SESSION') as session:
+        session.head.return_value = mock.Mock(ok=False, status_code=405)
+        session.get.return_value = FakeResponse(b'contact: info@shop.com')
+        assert gbs.extract_email_from_website('http://shop.com/') == 'info@shop.com'
+
+
+def test_head_timeout_skips_get():
+    for error in (gbs.requests.ReadTimeout('stalled'), gbs.requests.ConnectTimeout('unreachable'),
+                  gbs.requests.ConnectionError('connection reset')):
+        with mock.patch.object(gbs, 'SESSION') as session:
+            session.head.side_effect = error
+            assert gbs.extract_email_from_website('http://shop.com/') is None
+            session.get.assert_not_called()
+
+
+def run_main_with_failing_supabase(tmp_path, monkeypatch, **env):
+    for key, value in {
+        'GOOGLE_MAPS_API_KEY': 'key', 'SEARCH_LOCATION': '40.7,-74.0', 'SEARCH_QUERY': 'shops',
+        'OUTPUT_FILE': str(tmp_path / 'out'), 'USE_SUPABASE': 'true', 'SUPABASE_URL': 'not a url',
+        'SUPABASE_KEY': 'key', 'SUPABASE_TABLE_NAME': 'places', **env,
+    }.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(gbs, '_install_dns_cache', lambda: None)
+    monkeypatch.setattr(gbs, 'create_client', mock.Mock(side_effect=ValueError('Invalid URL')))
+    monkeypatch.setattr(gbs, '_fetch_places', lambda *args: iter([('p1', {'Name': 'a'})]))
+    gbs.main()
+
+
+def test_supabase_setup_failure_keeps_output_files(tmp_path, monkeypatch):
+    run_main_with_failing_supabase(tmp_path, monkeypatch)
+    assert (tmp_path / 'out.csv').read_text().splitlines() == ['Name', 'a']
+    assert (tmp_path / 'out.json').exists()
+
+
+def test_unreadable_processed_places_falls_back_to_empty(tmp_path, monkeypatch):
+    corrupt = tmp_path / 'processed_places'
+    corrupt.write_bytes(b'not a dbm file')
+    monkeypatch.setattr(gbs, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(gbs, 'PROCESSED_PLACES_FILE', str(corrupt))
+    assert gbs._load_processed_place_ids() == set()
+    gbs._mark_places_processed(['p1'])
+
+
+def test_supabase_setup_failure_marks_nothing_processed(tmp_path, monkeypatch):
+    mark = mock.Mock()
+    monkeypatch.setattr(gbs, '_mark_places_processed', mark)
+    run_main_with_failing_supabase(tmp_path, monkeypatch, SKIP_PROCESSED_PLACES='true')
+    assert (tmp_path / 'out.csv').exists()
+    mark.assert_not_called()
+
+
+def test_scraping_retries_are_bounded():
+    retries = gbs.SESSION.get_adapter('https://example.com/').max_retries
+    assert retries.read is False
+    assert retries.connect == 1
+
+
+def test_coordinate_strings_skip_geocoding(monkeypatch):
+    geocode = mock.Mock(return_value=(1.0, 2.0))
+    monkeypatch.setattr(gbs, '_geocode', geocode)
+    assert gbs.get_location_coordinates(None, ' 37.77 , -122.42 ') == (37.77, -122.42)
+    geocode.assert_not_called()
+    assert gbs.get_location_coordinates(None, '90210, 10001') == (1.0, 2.0)
+    geocode.assert_called_once_with(None, '90210, 10001')